@@ -91,18 +91,20 @@ async def register_new_user(
     background_tasks: BackgroundTasks = None
 ):
     """Register a new user"""
-    # Check if username already exists
-    db_user = await user_db.get_user_by_username(user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
+    # Hash the password before taking a pool slot, so bcrypt doesn't hold one
+    user_values = user_db.prepare_user(user)
     
-    # Check if email already exists
-    db_user = await user_db.get_user_by_email(user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Create user
-    user_data = await user_db.create_user(user)
+    # Check and insert on one pooled connection
+    async with user_db.db.connection() as conn:
+        # Check if username or email already exists in a single round-trip
+        username_taken, email_taken = await user_db.find_taken(user.username, user.email, conn=conn)
+        if username_taken:
+            raise HTTPException(status_code=400, detail="Username already registered")
+        if email_taken:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        
+        # Create user
+        user_data = await user_db.insert_user(user_values, conn=conn)
     
     # In a real app, you would send a verification email here
     # background_tasks.add_task(send_verification_email, user.email)
@@ -143,6 +145,10 @@ async def update_user_me(
     # Update user
     updated_user = await user_db.update_user(current_user["id"], user_update)
     
+    # A new token must not be served from a client built with the old one
+    if user_update.tinkoff_token is not None:
+        clear_client_cache(current_user["id"])
+    
     # Remove sensitive information
     if "hashed_password" in updated_user:
         del updated_user["hashed_password"]
@@ -198,13 +204,20 @@ async def update_user(
     user_db: UserDB = Depends(get_user_db)
 ):
     """Update any user (admin only)"""
-    # Check if user exists
-    user = await user_db.get_user(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Hash a new password before taking a pool slot, so bcrypt doesn't hold one
+    changes = user_db.prepare_update(user_update)
     
-    # Update user
-    updated_user = await user_db.update_user(user_id, user_update)
+    async with user_db.db.connection() as conn:
+        # Check if user exists
+        user = await user_db.get_user(user_id, conn=conn)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # Update user
+        updated_user = await user_db.apply_update(user_id, changes, conn=conn)
+    
+    if user_update.tinkoff_token is not None:
+        clear_client_cache(user_id)
     
     # Remove sensitive information
     if "hashed_password" in updated_user:
@@ -224,16 +237,20 @@ async def delete_user(
     user_db: UserDB = Depends(get_user_db)
 ):
     """Delete a user (admin only)"""
-    # Check if user exists
-    user = await user_db.get_user(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Delete user
-    success = await user_db.delete_user(user_id)
+    async with user_db.db.connection() as conn:
+        # Check if user exists
+        user = await user_db.get_user(user_id, conn=conn)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # Delete user
+        success = await user_db.delete_user(user_id, conn=conn)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to delete user")
     
+    # Drop the deleted user's cached client along with the account
+    clear_client_cache(user_id)
+    
     return {"message": "User deleted successfully"}
 
 # Update Tinkoff API token
@@ -1,14 +1,20 @@
 import asyncio
+import hashlib
 import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
+from operator import attrgetter
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import os
 from tinkoff.invest import CandleInterval, OrderDirection, OrderType, MoneyValue
 from tinkoff.invest.schemas import InstrumentExchangeType, RealExchange, PortfolioResponse, PostOrderResponse, OperationState, GetOperationsByCursorRequest, OperationType
 from tinkoff.invest import InstrumentStatus
 from tinkoff.invest.sandbox.async_client import AsyncSandboxClient
 from fastapi import Depends, HTTPException, status, Security
+from pydantic import TypeAdapter
 
 from schema.models import Instrument
 from auth.security import SecurityScopes
@@ -22,8 +28,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+INSTRUMENT_LIST = TypeAdapter(List[Instrument])
+
+def quotation_to_float(value) -> float:
+    """Convert a Quotation/MoneyValue (units + nano) to float"""
+    return value.units + value.nano / 1e9
+
+def candle_times(candles) -> pd.DatetimeIndex:
+    """Candle open times as a DatetimeIndex; an object array skips pandas' slow list inference"""
+    return pd.DatetimeIndex(np.fromiter((c.time for c in candles), dtype=object, count=len(candles)), name='time')
+
+def candle_prices(candles, field: str) -> np.ndarray:
+    """One price field of every candle as float64, with units and nano converted as whole arrays"""
+    count = len(candles)
+    units = np.fromiter(map(attrgetter(f'{field}.units'), candles), dtype=np.int64, count=count)
+    nano = np.fromiter(map(attrgetter(f'{field}.nano'), candles), dtype=np.int64, count=count)
+    return units + nano / 1e9
+
 class TinkoffClient:
     INITIAL_BALANCE = 1000000
+    # Upper bound on concurrent API calls issued by fan-out callers
+    MAX_CONCURRENT_REQUESTS = 8
+    # How long the instrument universe is served from memory before a refresh
+    INSTRUMENTS_TTL = 24 * 60 * 60
 
     def __init__(self, token: str):
         """
@@ -37,9 +64,40 @@ class TinkoffClient:
         self.token = token
         self._ticker_to_figi: Dict[str, str] = {}
         self._instruments: List[Instrument] = []
-        self._instruments_loaded = False
+        self._instruments_by_ticker: Dict[str, Instrument] = {}
+        self._instruments_loaded_at: Optional[float] = None
+        self._instruments_json: Optional[Tuple[bytes, str]] = None
+        # Sandbox connection shared by overlapping calls, see _shared_client
+        self._shared_manager: Optional[AsyncSandboxClient] = None
+        self._shared_services = None
+        self._shared_users = 0
+        self._shared_lock = asyncio.Lock()
         self.account_creation_date = None
 
+    @asynccontextmanager
+    async def _shared_client(self):
+        """Open one sandbox connection for all calls that overlap in time.
+
+        Concurrent fan-outs (candles for many FIGIs) multiplex their requests
+        over a single gRPC channel instead of each setting up its own; the
+        channel is closed as soon as the last user leaves.
+        """
+        self._shared_users += 1
+        try:
+            if self._shared_services is None:
+                async with self._shared_lock:
+                    if self._shared_services is None:
+                        manager = AsyncSandboxClient(self.token)
+                        self._shared_services = await manager.__aenter__()
+                        self._shared_manager = manager
+            yield self._shared_services
+        finally:
+            self._shared_users -= 1
+            if self._shared_users == 0 and self._shared_manager is not None:
+                manager = self._shared_manager
+                self._shared_manager, self._shared_services = None, None
+                await manager.__aexit__(None, None, None)
+
     async def close_all_sandbox_accounts(self):
         """Close all existing sandbox accounts"""
         async with AsyncSandboxClient(self.token) as client:
@@ -80,8 +138,9 @@ class TinkoffClient:
             await client.sandbox.close_sandbox_account(account_id=account_id)
 
     async def get_instruments(self, force_refresh: bool = False) -> List[Instrument]:
-        """Get all instruments, with caching"""
-        if not force_refresh and self._instruments_loaded:
+        """Get all instruments, cached for INSTRUMENTS_TTL seconds"""
+        if (not force_refresh and self._instruments_loaded_at is not None
+                and time.monotonic() - self._instruments_loaded_at < self.INSTRUMENTS_TTL):
             return self._instruments
             
         async with AsyncSandboxClient(self.token) as client:
@@ -119,25 +178,49 @@ class TinkoffClient:
                 for instrument in instruments
                 if instrument.real_exchange == RealExchange.REAL_EXCHANGE_MOEX
             ]
-            self._instruments_loaded = True
+            self._instruments_by_ticker = {i.ticker: i for i in self._instruments}
+            self._instruments_json = None
+            self._instruments_loaded_at = time.monotonic()
 
             return self._instruments
 
+    async def get_instruments_json(self) -> Tuple[bytes, str]:
+        """Get the cached instruments as a JSON body and its ETag, serialized once per refresh"""
+        instruments = await self.get_instruments()
+        if self._instruments_json is None:
+            body = INSTRUMENT_LIST.dump_json(instruments)
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            self._instruments_json = (body, etag)
+        return self._instruments_json
+
+    async def get_instruments_by_ticker(self) -> Dict[str, Instrument]:
+        """Get the cached MOEX instruments keyed by ticker"""
+        await self.get_instruments()
+        return self._instruments_by_ticker
+
     async def get_figi_by_ticker(self, ticker: str) -> str:
         """Get FIGI by ticker from the cached mapping"""
-        if not self._ticker_to_figi:
-            # If mapping is empty, fetch instruments to populate it
-            await self.get_instruments()
+        # Populates (or refreshes) the mapping when needed
+        await self.get_instruments()
         
         figi = self._ticker_to_figi.get(ticker)
         if not figi:
             raise ValueError(f"Ticker {ticker} not found")
         return figi
 
+    async def get_figis_by_tickers(self, tickers: List[str]) -> Dict[str, str]:
+        """Resolve several tickers to FIGIs with a single instrument lookup"""
+        await self.get_instruments()
+
+        missing = [ticker for ticker in tickers if ticker not in self._ticker_to_figi]
+        if missing:
+            raise ValueError(f"Tickers not found: {missing}")
+        return {ticker: self._ticker_to_figi[ticker] for ticker in tickers}
+
     async def get_stock_data(self, figi: str, from_date: datetime, to_date: datetime, 
                       interval: CandleInterval = CandleInterval.CANDLE_INTERVAL_DAY) -> pd.DataFrame:
         """Get historical stock data for a given FIGI"""
-        async with AsyncSandboxClient(self.token) as client:
+        async with self._shared_client() as client:
             candles = await client.market_data.get_candles(
                 figi=figi,
                 from_=from_date,
@@ -145,14 +228,15 @@ class TinkoffClient:
                 interval=interval
             )
             
-            df = pd.DataFrame([{
-                'time': c.time,
-                'open': c.open.units + c.open.nano / 1e9,
-                'high': c.high.units + c.high.nano / 1e9,
-                'low': c.low.units + c.low.nano / 1e9,
-                'close': c.close.units + c.close.nano / 1e9,
-                'volume': c.volume
-            } for c in candles.candles])
+            # Indexed by candle time with the timezone dropped, ready for alignment
+            index = candle_times(candles.candles).tz_localize(None)
+            df = pd.DataFrame({
+                'open': candle_prices(candles.candles, 'open'),
+                'high': candle_prices(candles.candles, 'high'),
+                'low': candle_prices(candles.candles, 'low'),
+                'close': candle_prices(candles.candles, 'close'),
+                'volume': [c.volume for c in candles.candles]
+            }, index=index)
             
             return df
 
@@ -221,8 +305,12 @@ class TinkoffClient:
         """Calculate portfolio value history based on operations and current positions"""
         logger.info(f"Getting portfolio history for account {account_id} from {from_date} to {to_date}")
         
-        # Get operations history in chronological order
-        operations = await self.get_operations(account_id, from_date, to_date)
+        # Get operations history in chronological order; the current snapshot
+        # does not depend on it, so both are requested concurrently
+        operations, current_portfolio = await asyncio.gather(
+            self.get_operations(account_id, from_date, to_date),
+            self.get_portfolio(account_id)
+        )
         operations = sorted(operations, key=lambda x: x.date)
         logger.info(f"Operations found: {len(operations)}")
         
@@ -232,28 +320,33 @@ class TinkoffClient:
             if hasattr(op, 'figi') and op.figi:
                 unique_figis.add(op.figi)
         
-        # Fetch historical data for all FIGIs at once
-        historical_data = {}
-        for figi in unique_figis:
-            try:
-                async with AsyncSandboxClient(self.token) as client:
-                    candles = await client.market_data.get_candles(
+        # Fetch historical data for all FIGIs concurrently
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+        async def fetch_candles(figi: str):
+            async with semaphore:
+                async with self._shared_client() as client:
+                    return await client.market_data.get_candles(
                         figi=figi,
                         from_=from_date,
                         to=to_date,
                         interval=CandleInterval.CANDLE_INTERVAL_1_MIN
                     )
-                if candles.candles:
-                    # Create a DataFrame with minute-by-minute prices
-                    df = pd.DataFrame([{
-                        'time': c.time,
-                        'price': c.close.units + c.close.nano / 1e9
-                    } for c in candles.candles])
-                    df.set_index('time', inplace=True)
-                    historical_data[figi] = df
-            except Exception as e:
-                logger.error(f"Error getting historical data for {figi}: {e}")
+
+        figis = list(unique_figis)
+        results = await asyncio.gather(*(fetch_candles(figi) for figi in figis), return_exceptions=True)
+
+        historical_data = {}
+        for figi, candles in zip(figis, results):
+            if isinstance(candles, Exception):
+                logger.error(f"Error getting historical data for {figi}: {candles}")
                 historical_data[figi] = pd.DataFrame()
+            elif candles.candles:
+                # Minute-by-minute prices, built from whole columns rather than one dict per candle
+                historical_data[figi] = pd.DataFrame(
+                    {'price': candle_prices(candles.candles, 'close')},
+                    index=candle_times(candles.candles)
+                )
         
         # Group operations by minute
         operations_by_minute = {}
@@ -275,7 +368,7 @@ class TinkoffClient:
             # Process all operations in this minute
             for op in ops:
                 logger.info(f"Processing operation: {op}")
-                payment = op.payment.units + op.payment.nano / 1e9 if op.payment else 0
+                payment = quotation_to_float(op.payment) if op.payment else 0
                 
                 # Update cash and positions using OperationType enums
                 if op.type == OperationType.OPERATION_TYPE_INPUT:
@@ -316,11 +409,10 @@ class TinkoffClient:
             }
         
         # Add current portfolio value
-        current_portfolio = await self.get_portfolio(account_id)
-        current_value = current_portfolio.total_amount_portfolio.units + current_portfolio.total_amount_portfolio.nano / 1e9
-        current_cash = current_portfolio.total_amount_currencies.units + current_portfolio.total_amount_currencies.nano / 1e9
+        current_value = quotation_to_float(current_portfolio.total_amount_portfolio)
+        current_cash = quotation_to_float(current_portfolio.total_amount_currencies)
         current_positions = {
-            position.figi: position.quantity.units + position.quantity.nano / 1e9
+            position.figi: quotation_to_float(position.quantity)
             for position in current_portfolio.positions
         }
         
@@ -0,0 +1 @@
+# Makes the backend packages (utils, service, ...) importable from tests/
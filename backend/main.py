@@ -9,6 +9,9 @@ from router.forward_test_router import router as forward_test_router
 from auth.router import router as auth_router
 from storage.db import db
 from auth.utils import create_initial_admin
+from utils.plot_render import shutdown_render_executor
+from utils.alpha_numba import warmup as warmup_kernels
+import asyncio
 import os
 
 @asynccontextmanager
@@ -19,7 +22,10 @@ async def lifespan(app: FastAPI):
     # Initialize auth system
     await create_initial_admin()
     
-    # Create static directory if it doesn't exist
+    # Compile the alpha kernels before the first request needs them
+    await asyncio.to_thread(warmup_kernels)
+    
+    # Create the reports directory once per process; report writers rely on it
     os.makedirs("static/reports", exist_ok=True)
     
     # Mount static files with proper configuration
@@ -29,6 +35,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown - close database connection
     await db.close()
+    shutdown_render_executor()
 
 app = FastAPI(
     title="Investment Alphas Backtesting API",
@@ -7,7 +7,7 @@ from client.tinkoff_client import TinkoffClient
 from utils.decorators import handle_errors
 from auth.router import get_current_user_with_db
 from utils.auth_deps import create_auth_client_dependency
-from storage.db import Database, get_db
+from router.alpha_router import get_alpha_service
 
 router = APIRouter(prefix="/api/v1/backtest", tags=["backtest"])
 
@@ -21,10 +21,6 @@ def get_backtest_service(
     """Dependency provider for BacktestService"""
     return BacktestService(tinkoff_client=client)
 
-def get_alpha_service(db: Database = Depends(get_db)) -> AlphaService:
-    """Dependency provider for AlphaService"""
-    return AlphaService(db=db)
-
 @router.post("/")
 @handle_errors
 async def backtest_alpha(
@@ -9,7 +9,7 @@ from client.tinkoff_client import TinkoffClient
 from utils.decorators import handle_errors
 from utils.auth_deps import create_auth_client_dependency
 from service.alpha_service import AlphaService
-from storage.db import Database, get_db
+from router.alpha_router import get_alpha_service
 from auth.router import get_current_user_with_db
 import os
 import pandas as pd
@@ -34,9 +34,6 @@ def get_forward_test_service(account_id: str, current_user: Dict[str, Any] = Sec
         raise HTTPException(status_code=404, detail=f"No forward test service found for account {account_id}")
     return _forward_test_services[user_id][account_id]
 
-def get_alpha_service(db: Database = Depends(get_db)) -> AlphaService:
-    return AlphaService(db=db)
-
 @router.post("/start")
 @handle_errors
 async def start_forward_test(
@@ -85,15 +82,19 @@ async def stop_forward_test(
     user_id = current_user["id"]
     service = get_forward_test_service(account_id, current_user)
     service.is_running = False
-    
-    # Close sandbox account
-    await client.close_sandbox_account(account_id)
-    
-    # Remove service from tracking
+
+    # Remove service from tracking before the broker round-trip so the
+    # forward test is stopped even if closing the sandbox account fails
     del _forward_test_services[user_id][account_id]
     if not _forward_test_services[user_id]:
         del _forward_test_services[user_id]
-    
+
+    # Close sandbox account
+    try:
+        await client.close_sandbox_account(account_id)
+    except Exception as e:
+        logger.error(f"Failed to close sandbox account {account_id}: {e}")
+
     return {"status": "stopped", "account_id": account_id}
 
 @router.get("/history/{account_id}")
@@ -115,37 +116,47 @@ async def get_forward_test_history(
         datetime.now(timezone.utc)
     )
     
-    # Convert to list of dicts for JSON serialization
+    # Convert to list of dicts for JSON serialization, formatting all
+    # timestamps in one vectorized call and reading columns instead of rows
+    timestamps = pd.DatetimeIndex(history.index).strftime('%Y-%m-%d %H:%M:%S').tolist()
     history_list = [
         {
-            'timestamp': date.strftime('%Y-%m-%d %H:%M:%S'),
-            'value': row['value'],
-            'cash': row['cash'],
-            'positions': row['positions']
+            'timestamp': timestamp,
+            'value': value,
+            'cash': cash,
+            'positions': positions
         }
-        for date, row in history.iterrows()
+        for timestamp, value, cash, positions in zip(
+            timestamps,
+            history['value'].tolist(),
+            history['cash'].tolist(),
+            history['positions'].tolist()
+        )
     ]
 
     # Calculate returns for quantstats
-    portfolio_value = history['value']
+    portfolio_value = history['value'].astype(float)
     
     # Calculate returns
     returns = pd.Series(
-        portfolio_value.pct_change().fillna(0),
+        portfolio_value.pct_change(fill_method=None).fillna(0),
         index=history.index,
         name='strategy'
     )
     
     report_url = None
+    # Reuse the last report while the value curve is unchanged: the same values
+    # at the same times, except the trailing "now" snapshot's timestamp, which
+    # moves on every poll
+    fingerprint = (tuple(history.index[:-1]), portfolio_value.to_numpy().tobytes())
+    if service.last_report is not None and service.last_report[0] == fingerprint:
+        report_url = service.last_report[1]
     # Only generate report if we have returns data
-    if len(returns) > 2 and not returns.empty:
+    elif len(returns) > 2 and not returns.empty:
         # Generate quantstats HTML report
         report_filename = f"forward_test_report_{account_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
         report_path = os.path.join("static", "reports", report_filename)
-        
-        # Create reports directory if it doesn't exist
-        os.makedirs(os.path.dirname(report_path), exist_ok=True)
-            
+
         qs.reports.html(
             returns=returns,
             output=report_path,
@@ -154,6 +165,7 @@ async def get_forward_test_history(
         )
         
         report_url = f"/api/static/reports/{report_filename}"
+        service.last_report = (fingerprint, report_url)
     
     return {
         'account_id': account_id,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, Request, Response, Security
 from typing import List, Dict, Any
 
 from schema.models import Instrument
@@ -23,7 +23,14 @@ def get_backtest_service(
 @router.get("/instruments", response_model=List[Instrument])
 @handle_errors
 async def get_instruments(
+    request: Request,
     service: BacktestService = Depends(get_backtest_service)
 ):
     """Get available instruments for trading"""
-    return await service.get_instruments() 
\ No newline at end of file
+    # Serve the body serialized at the last refresh instead of re-validating
+    # and re-encoding thousands of models on every call
+    body, etag = await service.get_instruments_json()
+    headers = {"ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -8,8 +8,7 @@ class AlphaService:
 
     async def create_alpha(self, alpha: str) -> Dict[str, Any]:
         try:
-            alpha_id = await self.db.create_alpha(alpha)
-            return await self.get_alpha(alpha_id)
+            return await self.db.create_alpha(alpha)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -26,14 +25,13 @@ class AlphaService:
             raise HTTPException(status_code=500, detail=str(e))
 
     async def update_alpha(self, alpha_id: int, alpha: str) -> Dict[str, Any]:
-        success = await self.db.update_alpha(alpha_id, alpha)
-        if not success:
+        updated = await self.db.update_alpha(alpha_id, alpha)
+        if not updated:
             raise HTTPException(status_code=404, detail="Alpha not found")
-        return await self.get_alpha(alpha_id)
+        return updated
 
     async def delete_alpha(self, alpha_id: int) -> Dict[str, Any]:
-        alpha = await self.get_alpha(alpha_id)
-        success = await self.db.delete_alpha(alpha_id)
-        if not success:
+        deleted = await self.db.delete_alpha(alpha_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Alpha not found")
-        return alpha 
\ No newline at end of file
+        return deleted 
\ No newline at end of file
@@ -1,4 +1,6 @@
-from typing import List, Dict, Any
+import asyncio
+import logging
+from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 import numpy as np
@@ -12,14 +14,25 @@ import matplotlib.pyplot as plt
 from matplotlib.figure import Figure
 import seaborn as sns
 from io import StringIO
-import tempfile
 import os
 
 from client.tinkoff_client import TinkoffClient
+from storage.price_cache import price_cache
 from schema.models import BacktestRequest, Instrument, BacktestResponse, BacktestResult
 from tinkoff.invest.schemas import RealExchange
-from utils.alpha_calculator import calculate_alpha1, neutralize_weights
+from utils.alpha_calculator import neutralize_array
+from utils.plot_render import render_pngs
 
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ('close', 'open', 'high', 'low', 'volume')
+
+# Portfolio statistics returned to the client; vectorbt skips the rest
+STATS_METRICS = [
+    'start', 'end', 'period', 'start_value', 'end_value',
+    'total_return', 'benchmark_return', 'total_fees_paid', 'max_dd',
+    'total_trades', 'win_rate', 'sharpe_ratio', 'sortino_ratio',
+]
 
 class BacktestService:
     def __init__(self, tinkoff_client: TinkoffClient = None):
@@ -31,39 +44,55 @@ class BacktestService:
         instruments = await self.tinkoff_client.get_instruments()
         return [i for i in instruments if i.real_exchange == RealExchange.REAL_EXCHANGE_MOEX]
 
+    async def get_instruments_json(self) -> Tuple[bytes, str]:
+        """Get the MOEX instruments pre-serialized as JSON, with their ETag"""
+        # The client only caches MOEX instruments, so no filtering is needed
+        return await self.tinkoff_client.get_instruments_json()
+
     async def run_backtest(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Run backtest for selected instruments"""
         if not request.get('expression'):
             raise ValueError("No expression provided")
             
-        # Get historical data for all instruments
-        portfolio_data = {}
-        for ticker in request['instruments']:
-            # Get FIGI by ticker
-            figi = await self.tinkoff_client.get_figi_by_ticker(ticker)
-            if not figi:
-                continue
-                
-            # Get historical data
-            data = await self.tinkoff_client.get_stock_data(
-                figi,
-                request['start_date'],
-                request['end_date']
-            )
-            
+        # Resolve FIGIs up front, served from the client's instrument cache
+        figis = await self.tinkoff_client.get_figis_by_tickers(request['instruments'])
+
+        # Get historical data for all instruments concurrently
+        semaphore = asyncio.Semaphore(self.tinkoff_client.MAX_CONCURRENT_REQUESTS)
+
+        async def fetch(figi: str) -> pd.DataFrame:
+            data = price_cache.get(figi, request['start_date'], request['end_date'])
             if data is not None:
-                # Convert to DataFrame
-                df = pd.DataFrame(data)
-                df['time'] = pd.to_datetime(df['time']).dt.tz_localize(None)  # Remove timezone info
-                df.set_index('time', inplace=True)
-                portfolio_data[ticker] = df
+                return data
+            async with semaphore:
+                data = await self.tinkoff_client.get_stock_data(
+                    figi,
+                    request['start_date'],
+                    request['end_date']
+                )
+            price_cache.set(figi, request['start_date'], request['end_date'], data)
+            return data
+
+        results = await asyncio.gather(*(fetch(figi) for figi in figis.values()))
+
+        # Candles come back indexed by tz-naive time, so they can be used as-is
+        portfolio_data = {
+            ticker: data
+            for ticker, data in zip(figis, results)
+            if data is not None
+        }
         
         if not portfolio_data:
             raise ValueError("No data available for the selected instruments")
             
-        # Calculate alpha signals
-        signals = self._calculate_alpha_signals(portfolio_data, request['expression'])
-        signals = neutralize_weights(signals)
+        # Calculate alpha signals off the event loop; the kernels release the GIL
+        signals = await asyncio.to_thread(self._calculate_alpha_signals, portfolio_data, request['expression'])
+        # Neutralize in place on a float64 copy and label it once for vectorbt
+        signals = pd.DataFrame(
+            neutralize_array(signals.to_numpy(dtype=np.float64, copy=True)),
+            index=signals.index,
+            columns=signals.columns
+        )
         
         # Create portfolio
         prices = pd.DataFrame({
@@ -71,40 +100,41 @@ class BacktestService:
             for name, data in portfolio_data.items()
         })
 
+        # Signals are cross-sectional target weights: simulate all instruments
+        # as one cash-sharing group in a single pass of vectorbt's kernel
         portfolio = vbt.Portfolio.from_orders(
-            prices,
+            prices.astype(np.float64),
             signals,
-            size_type=SizeType.Percent,
+            size_type=SizeType.TargetPercent,
+            group_by=True,
+            cash_sharing=True,
             init_cash=1000000,  # Initial capital
             fees=0.001,         # 0.1% trading fee
             freq='1D',          # Daily data
         )
 
         # Generate portfolio statistics
-        stats = portfolio.stats()
+        stats = portfolio.stats(metrics=STATS_METRICS)
         
         # Generate quantstats HTML report
         report_filename = f"backtest_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
         report_path = os.path.join("static", "reports", report_filename)
-        
-        # Create reports directory if it doesn't exist
-        os.makedirs(os.path.dirname(report_path), exist_ok=True)
-            
+
         # Calculate returns for quantstats
         # Get the total portfolio value over time and calculate returns
-        portfolio_value = portfolio.value().sum(axis=1)  # Sum across all assets
-        returns = pd.Series(
-            portfolio_value.pct_change().fillna(0),
-            index=portfolio_value.index,
-            name='strategy'
-        )
+        portfolio_value = portfolio.value()  # Value of the whole group
+        value = portfolio_value.to_numpy()
+        period_returns = value[1:] / value[:-1] - 1.0
+        strategy = np.zeros(len(value))
+        strategy[1:] = np.where(np.isnan(period_returns), 0.0, period_returns)
+        returns = pd.Series(strategy, index=portfolio_value.index, name='strategy')
         
-        # Calculate benchmark returns
-        benchmark_returns = pd.Series(
-            pd.DataFrame({ticker: data['close'] for ticker, data in portfolio_data.items()}).pct_change().fillna(0).mean(axis=1),
-            index=portfolio_data[request['instruments'][0]].index,
-            name='benchmark'
-        )
+        # Calculate equal-weight benchmark returns straight from the price matrix
+        closes = prices.to_numpy(dtype=np.float64)
+        period_returns = closes[1:] / closes[:-1] - 1.0
+        benchmark = np.zeros(len(closes))
+        benchmark[1:] = np.where(np.isnan(period_returns), 0.0, period_returns).mean(axis=1)
+        benchmark_returns = pd.Series(benchmark, index=prices.index, name='benchmark')
             
         qs.reports.html(
             returns=returns,
@@ -115,16 +145,16 @@ class BacktestService:
             download_filename=report_filename
         )
         
-        # Generate plots
-        plots = {}
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Individual ticker plots
-            for ticker in request['instruments']:
-                fig = portfolio[ticker].plot()
-                plot_path = os.path.join(temp_dir, f'{ticker}_plot.png')
-                fig.write_image(plot_path)
-                with open(plot_path, 'rb') as f:
-                    plots[f'{ticker}_plot'] = base64.b64encode(f.read()).decode('utf-8')
+        # Generate individual ticker plots, rendering the images in parallel
+        figures = {
+            ticker: portfolio.plot(column=ticker, group_by=False)
+            for ticker in request['instruments']
+        }
+        images = await render_pngs(figures)
+        plots = {
+            f'{ticker}_plot': base64.b64encode(image).decode('utf-8')
+            for ticker, image in images.items()
+        }
 
         return {
             "statistics": stats.to_dict(),
@@ -133,23 +163,42 @@ class BacktestService:
         }
 
     def _calculate_alpha_signals(self, portfolio_data: Dict[str, pd.DataFrame], expression: str) -> pd.DataFrame:
-        """Calculate alpha signals for all instruments"""
-        signals = pd.DataFrame(index=portfolio_data[list(portfolio_data.keys())[0]].index)
-        
+        """Calculate alpha signals for all instruments in one pass over (time x ticker) panels"""
+        index = portfolio_data[list(portfolio_data.keys())[0]].index
+        tickers = list(portfolio_data.keys())
+
+        # Stack every price field into a single frame so the expression is
+        # evaluated once column-wise instead of once per ticker. Tickers are joined
+        # on the union of their dates; a bar one of them is missing is carried
+        # forward, so it doesn't turn every rolling window over it into NaN
+        context = {
+            field: pd.DataFrame({ticker: data[field] for ticker, data in portfolio_data.items()}).ffill()
+            for field in PRICE_FIELDS
+        }
+
+        try:
+            # Interpreted on the warmed-up alpha_numba kernels: a one-off backtest
+            # would spend longer JIT-compiling a formula kernel than it saves
+            alpha_expr = self.parser.parse(expression)
+            return _signal_frame(alpha_expr.evaluate(context), index, tickers)
+        except Exception as e:
+            logger.error(f"Error calculating alpha on the panel, retrying per ticker: {e}")
+
+        # One failing ticker should only zero its own signal
+        signals = pd.DataFrame(index=index, columns=tickers, dtype=np.float64)
         for ticker, data in portfolio_data.items():
-            context = {
-                'close': data['close'],
-                'open': data['open'],
-                'high': data['high'],
-                'low': data['low'],
-                'volume': data['volume']
-            }
-            
             try:
                 alpha_expr = self.parser.parse(expression)
-                signals[ticker] = alpha_expr.evaluate(context)
+                context = {field: data[field].to_frame(ticker) for field in PRICE_FIELDS}
+                signals[ticker] = _signal_frame(alpha_expr.evaluate(context), index, [ticker])[ticker]
             except Exception as e:
-                print(f"Error calculating alpha for {ticker}: {e}")
-                signals[ticker] = 0
-                
+                logger.error(f"Error calculating alpha for {ticker}: {e}")
+                signals[ticker] = 0.0
+
         return signals
+
+def _signal_frame(result, index: pd.Index, tickers: List[str]) -> pd.DataFrame:
+    """Label an evaluated expression as a (time x ticker) signal frame"""
+    if isinstance(result, pd.DataFrame):
+        return result.reindex(index=index, columns=tickers)
+    return pd.DataFrame(result, index=index, columns=tickers)
@@ -1,11 +1,12 @@
 import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional
 
-from client.tinkoff_client import TinkoffClient
-from utils.alpha_calculator import calculate_alpha1, neutralize_weights
+from client.tinkoff_client import TinkoffClient, quotation_to_float
+from utils.alpha_calculator import calculate_alpha1_latest, neutralize_array, stack_right_aligned
 from tinkoff.invest import (
     CandleInterval,
     OrderDirection,
@@ -22,6 +23,7 @@ from utils.expression_parser import ExpressionParser
 logger = logging.getLogger(__name__)
 
 class ForwardTestService:
+    CHECK_INTERVAL = 300  # Seconds between schedule checks in run()
     
     def __init__(self, account_id: str, target_stocks: List[str], tinkoff_client: Optional[TinkoffClient] = None,
                  expression: Optional[str] = None):
@@ -35,24 +37,33 @@ class ForwardTestService:
         self.positions_task = None
         self.is_running = False
         self.target_instruments: Dict[str, Instrument] = {}
+        self.ticker_to_figi: Dict[str, str] = {}
         self.start_date = self.client.account_creation_date
         self.expression = expression
+        self.alpha_expression = None  # Compiled form of `expression`, built in initialize
         self.last_execution_date = None  # Track the date of last execution
+        self.last_report = None  # (value curve fingerprint, report URL) of the latest history report
 
 
     async def initialize(self):
         """Initialize the service and get necessary data"""
         # Get instruments and verify all target stocks exist
-        instruments = await self.client.get_instruments()
+        instruments = await self.client.get_instruments_by_ticker()
         self.target_instruments = {
-            i.ticker: i for i in instruments 
-            if i.ticker in self.target_stocks
+            ticker: instruments[ticker] for ticker in self.target_stocks
+            if ticker in instruments
         }
         
         if len(self.target_instruments) != len(self.target_stocks):
             missing = set(self.target_stocks) - set(self.target_instruments.keys())
             raise ValueError(f"Some target stocks not found: {missing}")
         
+        self.ticker_to_figi = {ticker: i.figi for ticker, i in self.target_instruments.items()}
+
+        # Compile the alpha once for the lifetime of the service; Numba's JIT
+        # takes seconds, so it runs in a worker thread instead of on the loop
+        if self.expression:
+            self.alpha_expression = await asyncio.to_thread(self._compile_alpha, self.expression)
         logger.info(f"Tracking stocks: {list(self.target_instruments.keys())}")
 
     async def get_current_positions(self):
@@ -62,8 +73,8 @@ class ForwardTestService:
             position.figi: position.quantity.units 
             for position in portfolio.positions
         }
-        self.total_value = portfolio.total_amount_portfolio.units + portfolio.total_amount_portfolio.nano / 1e9
-        logger.info(f"Current positions: {self.positions}")
+        self.total_value = quotation_to_float(portfolio.total_amount_portfolio)
+        logger.info("Current positions: %s", self.positions)
         logger.info(f"Total portfolio value: {self.total_value:.2f} RUB")
         return self.positions
 
@@ -71,79 +82,117 @@ class ForwardTestService:
         """Get historical data for target stocks"""
         end_date = datetime.now(timezone.utc)
         start_date = self.start_date
-        
-        for instrument in self.target_instruments.values():
-            try:
+        semaphore = asyncio.Semaphore(self.client.MAX_CONCURRENT_REQUESTS)
+
+        async def fetch(instrument: Instrument) -> pd.DataFrame:
+            # After the first run only fetch from the last stored candle on
+            # (it may have been incomplete) and stitch it onto the history
+            cached = self.prices_data.get(instrument.ticker)
+            if cached is not None and not cached.empty:
+                from_date = cached.index[-1].tz_localize(timezone.utc).to_pydatetime()
+            else:
+                cached = None
+                from_date = start_date - timedelta(days=days_back)
+
+            async with semaphore:
                 data = await self.client.get_stock_data(
                     figi=instrument.figi,
-                    from_date=start_date - timedelta(days=days_back),
+                    from_date=from_date,
                     to_date=end_date,
                     interval=CandleInterval.CANDLE_INTERVAL_DAY
                 )
-                self.prices_data[instrument.ticker] = data
-                logger.info(f"Retrieved {len(data)} daily candles for {instrument.ticker}")
-            except Exception as e:
-                logger.error(f"Error getting data for {instrument.ticker}: {e}")
+
+            if cached is not None:
+                data = pd.concat([cached, data])
+                data = data[~data.index.duplicated(keep='last')]
+            return data
+
+        # Fetch all tickers concurrently so the round-trips overlap
+        instruments = list(self.target_instruments.values())
+        results = await asyncio.gather(*(fetch(i) for i in instruments), return_exceptions=True)
+
+        for instrument, data in zip(instruments, results):
+            if isinstance(data, Exception):
+                logger.error(f"Error getting data for {instrument.ticker}: {data}")
+                continue
+            self.prices_data[instrument.ticker] = data
+            logger.info(f"Retrieved {len(data)} daily candles for {instrument.ticker}")
+
+    @staticmethod
+    def _compile_alpha(expression: str):
+        """Compile `expression` and JIT its kernels on a tiny panel shaped like the real one"""
+        alpha_expression = ExpressionParser().compile(expression)
+        context = {field: pd.DataFrame(np.ones((2, 1))) for field in ('open', 'high', 'low', 'close', 'volume')}
+        try:
+            alpha_expression.evaluate(context)
+        except Exception as e:
+            # Errors that depend on the data surface on the first real evaluation
+            logger.warning("Could not warm up alpha %r: %s", expression, e)
+        return alpha_expression
 
     def calculate_alpha_signals(self) -> Dict[str, float]:
         """Calculate alpha signals for all stocks"""
-        alpha_signals = {}
+        tickers = list(self.prices_data)
+        frames = list(self.prices_data.values())
 
-        if self.expression:
-            parser = ExpressionParser()
-            expr = parser.parse(self.expression)
-
-            for ticker, df in self.prices_data.items():
-                context = {col: df[col] for col in df.columns if col != 'time'}
-                series = expr.evaluate(context)
-                alpha_signals[ticker] = series.iloc[-1]
+        if self.alpha_expression is not None:
+            # Evaluate once over (time x ticker) panels and keep only today's row
+            columns = frames[0].columns if frames else []
+            context = {
+                col: pd.DataFrame(stack_right_aligned([df[col].to_numpy(dtype=np.float64) for df in frames]))
+                for col in columns
+            }
+            signals = np.asarray(self.alpha_expression.evaluate(context), dtype=np.float64)[-1]
         else:
-            for ticker, df in self.prices_data.items():
-                alpha = calculate_alpha1(df)
-                alpha_signals[ticker] = alpha.iloc[-1]
+            # One kernel call over the (time x ticker) close matrix
+            signals = calculate_alpha1_latest([df['close'].to_numpy(dtype=np.float64) for df in frames])
 
-        # Convert to DataFrame and neutralize
-        alpha_df = pd.DataFrame([alpha_signals])
-        neutralized_alpha = neutralize_weights(alpha_df).iloc[0]
-        
-        return neutralized_alpha.to_dict()
+        # Neutralize across tickers as a single row
+        neutralized = neutralize_array(signals.reshape(1, -1))[0]
+        return dict(zip(tickers, neutralized.tolist()))
 
     async def execute_trades(self, alpha_signals: Dict[str, float]):
         """Execute trades based on alpha signals"""
-        logger.info("Starting trade execution with signals:")
-        for ticker, signal in alpha_signals.items():
-            if signal == None:
-                continue
-            logger.info(f"{ticker}: signal={signal:.4f}, current_position={self.positions.get(self.target_instruments[ticker].figi, 0)}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Starting trade execution with signals:")
+            for ticker, signal in alpha_signals.items():
+                if signal == None:
+                    continue
+                logger.info("%s: signal=%.4f, current_position=%s", ticker, signal, self.positions.get(self.ticker_to_figi[ticker], 0))
         
-        # Calculate base position size (10% of initial balance)
-        current_portfolio = await self.client.get_portfolio(self.account_id)
-        current_value = current_portfolio.total_amount_portfolio.units + current_portfolio.total_amount_portfolio.nano / 1e9
-        base_position_size = current_value * 0.95
+        # Calculate base position size from the portfolio snapshot taken by
+        # get_current_positions earlier in this cycle
+        base_position_size = self.total_value * 0.95
         
+        # Latest close per ticker, extracted once instead of per action
+        last_prices = {
+            ticker: df['close'].to_numpy()[-1]
+            for ticker, df in self.prices_data.items() if not df.empty
+        }
+
         # Prepare trade actions
         trade_actions = []
         for ticker, signal in alpha_signals.items():
             if signal == None:
                 continue
             instrument = self.target_instruments[ticker]
-            current_position = self.positions.get(instrument.figi, 0)
+            current_position = self.positions.get(self.ticker_to_figi[ticker], 0)
             
             # Get current price from historical data
-            if ticker not in self.prices_data or self.prices_data[ticker].empty:
+            current_price = last_prices.get(ticker)
+            if current_price is None:
                 logger.error(f"No price data available for {ticker}")
                 continue
-                
-            current_price = self.prices_data[ticker]['close'].iloc[-1]
             
             # Calculate target position value based on signal
             target_value = base_position_size * signal
             
             # Convert to number of lots
-            target_lots = round(target_value / (current_price * instrument.lot_size))
+            lot_size = instrument.lot_size
+            target_lots = round(target_value / (current_price * lot_size))
             
             # Calculate position change needed (in lots)
-            position_change = target_lots - (current_position // instrument.lot_size)
+            position_change = target_lots - (current_position // lot_size)
             
             trade_actions.append({
                 'ticker': ticker,
@@ -154,40 +203,47 @@ class ForwardTestService:
                 'current_price': current_price
             })
         
-        # Execute all sell orders first
-        for action in trade_actions:
-            if action['position_change'] < 0:
-                try:
-                    await self.client.post_order(
-                        account_id=self.account_id,
-                        figi=action['instrument'].figi,
-                        quantity=abs(action['position_change']),
-                        direction=OrderDirection.ORDER_DIRECTION_SELL,
-                        order_type=OrderType.ORDER_TYPE_MARKET
-                    )
-                    logger.info(f"Executed SELL order for {action['ticker']}: {abs(action['position_change'])} lots ({abs(action['position_change']) * action['instrument'].lot_size} shares) (signal: {action['signal']:.4f}, target_value: {action['target_value']:.2f} RUB, price: {action['current_price']:.2f} RUB)")
-                except Exception as e:
-                    logger.error(f"Failed to execute SELL order for {action['ticker']}: {str(e)}")
-        
+        async def submit(action: dict, direction: OrderDirection):
+            side = 'SELL' if direction == OrderDirection.ORDER_DIRECTION_SELL else 'BUY'
+            lots = abs(action['position_change'])
+            try:
+                await self.client.post_order(
+                    account_id=self.account_id,
+                    figi=action['instrument'].figi,
+                    quantity=lots,
+                    direction=direction,
+                    order_type=OrderType.ORDER_TYPE_MARKET
+                )
+                logger.info(
+                    "Executed %s order for %s: %d lots (%d shares) (signal: %.4f, target_value: %.2f RUB, price: %.2f RUB)",
+                    side, action['ticker'], lots, lots * action['instrument'].lot_size,
+                    action['signal'], action['target_value'], action['current_price']
+                )
+            except Exception as e:
+                logger.error("Failed to execute %s order for %s: %s", side, action['ticker'], e)
+
+        # Execute all sell orders first, concurrently, so their cash is freed
+        await asyncio.gather(*(
+            submit(action, OrderDirection.ORDER_DIRECTION_SELL)
+            for action in trade_actions if action['position_change'] < 0
+        ))
+
         # Execute all buy orders after sells
-        for action in trade_actions:
-            if action['position_change'] > 0:
-                try:
-                    await self.client.post_order(
-                        account_id=self.account_id,
-                        figi=action['instrument'].figi,
-                        quantity=action['position_change'],
-                        direction=OrderDirection.ORDER_DIRECTION_BUY,
-                        order_type=OrderType.ORDER_TYPE_MARKET
-                    )
-                    logger.info(f"Executed BUY order for {action['ticker']}: {action['position_change']} lots ({action['position_change'] * action['instrument'].lot_size} shares) (signal: {action['signal']:.4f}, target_value: {action['target_value']:.2f} RUB, price: {action['current_price']:.2f} RUB)")
-                except Exception as e:
-                    logger.error(f"Failed to execute BUY order for {action['ticker']}: {str(e)}")
+        await asyncio.gather(*(
+            submit(action, OrderDirection.ORDER_DIRECTION_BUY)
+            for action in trade_actions if action['position_change'] > 0
+        ))
 
     async def run(self):
         """Main execution loop - runs once per day during trading hours"""
         self.is_running = True
         logger.info(f"Starting forward test service for account {self.account_id}")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        async def sleep_until_next_check():
+            # Wake on a fixed grid from the start so slow cycles don't push later checks back
+            await asyncio.sleep(self.CHECK_INTERVAL - (loop.time() - started) % self.CHECK_INTERVAL)
         
         while self.is_running:
             try:
@@ -197,12 +253,13 @@ class ForwardTestService:
                 
                 # Check if we already executed today
                 if self.last_execution_date == current_date:
-                    logger.debug(f"Already executed trades for {current_date}, waiting for next trading day")
-                    await asyncio.sleep(300)  # Check every 5 minutes
+                    logger.debug("Already executed trades for %s, waiting for next trading day", current_date)
+                    await sleep_until_next_check()
                     continue
                 
                 # Check if it's a weekday and within trading hours (10:00 - 18:45 Moscow time)
-                if now.weekday() < 5 and 10 <= now.hour < 18 or (now.hour == 18 and now.minute <= 45):
+                trading_open_today = now.weekday() < 5
+                if trading_open_today and (10 <= now.hour < 18 or (now.hour == 18 and now.minute <= 45)):
                     logger.info(f"Starting daily execution for {current_date}")
                     
                     # Get current positions
@@ -212,8 +269,9 @@ class ForwardTestService:
                     await self.get_historical_data()
                     
                     # Calculate alpha signals
-                    alpha_signals = self.calculate_alpha_signals()
-                    logger.info(f"Daily alpha signals: {alpha_signals}")
+                    # The kernels release the GIL, so keep the loop free while they run
+                    alpha_signals = await asyncio.to_thread(self.calculate_alpha_signals)
+                    logger.info("Daily alpha signals: %s", alpha_signals)
                     
                     # Execute trades
                     await self.execute_trades(alpha_signals)
@@ -222,9 +280,9 @@ class ForwardTestService:
                     self.last_execution_date = current_date
                     logger.info(f"Daily execution completed for {current_date}, next execution will be on next trading day")
                 else:
-                    logger.debug(f"Outside trading hours on {current_date}, waiting for next check")
+                    logger.debug("Outside trading hours on %s, waiting for next check", current_date)
                 
-                await asyncio.sleep(300)  # Check every 5 minutes
+                await sleep_until_next_check()
                 
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+import pandas as pd
+from cachetools import TTLCache
+
+def _utc_naive(moment: datetime) -> pd.Timestamp:
+    """Normalize a request bound to the tz-naive UTC time the candle index uses"""
+    ts = pd.Timestamp(moment)
+    return ts.tz_convert('UTC').tz_localize(None) if ts.tz is not None else ts
+
+class PriceCache:
+    """In-process cache of historical candles shared by all requests.
+
+    One entry is kept per (FIGI, interval) together with the time range it
+    covers, so any window inside that range is sliced from memory and
+    overlapping fetches are stitched into a single wider entry.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: int = 24 * 60 * 60):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _key(figi: str, interval: str) -> str:
+        return f"px:{figi}:{interval}"
+
+    def get(self, figi: str, start: datetime, end: datetime, interval: str = "1D") -> Optional[pd.DataFrame]:
+        """Return a copy of the cached candles in [start, end), or None if the range isn't covered"""
+        entry = self._cache.get(self._key(figi, interval))
+        if entry is None:
+            return None
+        covered_start, covered_end, data = entry
+        start, end = _utc_naive(start), _utc_naive(end)
+        if start < covered_start or end > covered_end:
+            return None
+        return data[(data.index >= start) & (data.index < end)].copy()
+
+    def set(self, figi: str, start: datetime, end: datetime, data: pd.DataFrame, interval: str = "1D"):
+        key = self._key(figi, interval)
+        start, end = _utc_naive(start), _utc_naive(end)
+        # Only closed candles are final: never mark the running interval (or the
+        # future) as covered, and keep its partial candle out of the entry
+        end = min(end, pd.Timestamp.now(tz='UTC').tz_localize(None).floor(interval))
+        if end <= start:
+            return
+        data = data[data.index < end]
+        entry = self._cache.get(key)
+        if entry is not None:
+            covered_start, covered_end, cached = entry
+            # Merge with the cached range when the two touch, newest candles winning
+            if start <= covered_end and covered_start <= end:
+                data = pd.concat([cached, data])
+                data = data[~data.index.duplicated(keep='last')].sort_index()
+                start, end = min(start, covered_start), max(end, covered_end)
+        self._cache[key] = (start, end, data)
+
+# Create global price cache instance shared across requests
+price_cache = PriceCache()
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import alpha_numba
+from utils.alpha_calculator import neutralize_array
+
+
+def _panel(kind, rows=80, cols=4):
+    rng = np.random.default_rng(7)
+    if kind == 'ties':
+        values = rng.integers(0, 4, (rows, cols)).astype(np.float64)
+    elif kind == 'offset':
+        values = 1e9 + rng.random((rows, cols))
+    else:
+        values = rng.standard_normal((rows, cols))
+    # Scattered NaNs plus a NaN run, so windows restart mid-column
+    values[rng.random((rows, cols)) < 0.05] = np.nan
+    values[30:33, 1] = np.nan
+    return values
+
+
+@pytest.fixture(params=['nans', 'ties', 'offset'])
+def values(request):
+    return _panel(request.param)
+
+
+def _rolling_apply(values, window, func):
+    return pd.DataFrame(values).rolling(window).apply(func, raw=True).to_numpy()
+
+
+@pytest.mark.parametrize('window', [1, 5, 20])
+def test_rolling_sum_and_mean_match_pandas(values, window):
+    expected = pd.DataFrame(values).rolling(window)
+    np.testing.assert_allclose(alpha_numba.rolling_sum(values, window), expected.sum().to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(alpha_numba.rolling_mean(values, window), expected.mean().to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize('window', [2, 5, 20])
+@pytest.mark.parametrize('ddof', [0, 1])
+def test_rolling_std_matches_two_pass(values, window, ddof):
+    # Exact two-pass reference: pandas' online variance drifts on large offsets
+    expected = _rolling_apply(values, window, lambda w: np.std(w, ddof=ddof))
+    np.testing.assert_allclose(alpha_numba.rolling_std(values, window, ddof), expected, rtol=1e-9, atol=1e-10)
+
+
+@pytest.mark.parametrize('window', [1, 5])
+def test_rolling_prod_matches_pandas(window):
+    values = 1.0 + _panel('nans') / 10
+    np.testing.assert_allclose(alpha_numba.rolling_prod(values, window), _rolling_apply(values, window, np.prod))
+
+
+@pytest.mark.parametrize('window', [1, 5, 10])
+def test_rolling_rank_matches_pandas(values, window):
+    expected = _rolling_apply(values, window, lambda w: pd.Series(w).rank(pct=True).iloc[-1] - 0.5)
+    np.testing.assert_allclose(alpha_numba.rolling_rank(values, window), expected)
+
+
+@pytest.mark.parametrize('correlation', [False, True])
+def test_rolling_cov_matches_pandas(correlation):
+    x, y = _panel('nans'), _panel('nans')[::-1].copy()
+    rolling = pd.DataFrame(x).rolling(10)
+    expected = rolling.corr(pd.DataFrame(y)) if correlation else rolling.cov(pd.DataFrame(y))
+    np.testing.assert_allclose(alpha_numba.rolling_cov(x, y, 10, correlation), expected.to_numpy(), atol=1e-12)
+
+
+@pytest.mark.parametrize('window', [1, 3, 7, 80, 100])
+def test_rolling_min_and_max_match_pandas(values, window):
+    expected = pd.DataFrame(values).rolling(window)
+    np.testing.assert_array_equal(alpha_numba.rolling_min(values, window), expected.min().to_numpy())
+    np.testing.assert_array_equal(alpha_numba.rolling_max(values, window), expected.max().to_numpy())
+
+
+@pytest.mark.parametrize('window', [1, 5, 12])
+def test_ts_argmax_matches_pandas(values, window):
+    for j in range(values.shape[1]):
+        column = np.ascontiguousarray(values[:, j])
+        expected = pd.Series(column).rolling(window).apply(np.argmax, raw=True).to_numpy()
+        np.testing.assert_array_equal(alpha_numba.ts_argmax(column, window), expected)
+
+
+@pytest.mark.parametrize('window', [1, 5, 12])
+def test_rolling_argmax_and_argmin_match_pandas(values, window):
+    np.testing.assert_array_equal(alpha_numba.rolling_argmax(values, window), _rolling_apply(values, window, np.argmax))
+    np.testing.assert_array_equal(alpha_numba.rolling_argmin(values, window), _rolling_apply(values, window, np.argmin))
+
+
+def test_rank_pct_matches_pandas(values):
+    expected = pd.DataFrame(values).rank(pct=True) - 0.5
+    np.testing.assert_allclose(alpha_numba.rank_pct(values), expected.to_numpy())
+    np.testing.assert_allclose(alpha_numba.rank_pct_last(values), alpha_numba.rank_pct(values)[-1])
+
+
+def _pandas_alpha1(close: pd.Series) -> pd.Series:
+    """The original per-ticker pandas implementation of alpha1"""
+    returns = close.pct_change()
+    returns_stddev = returns.rolling(window=20, closed='left').std()
+    power_term = np.where(returns < 0, returns_stddev, close)
+    signed_power = np.sign(power_term) * (np.abs(power_term) ** 2)
+    ts_argmax = pd.Series(signed_power).rolling(5, closed='left').apply(np.argmax)
+    return ts_argmax.rank(pct=True) - 0.5
+
+
+@pytest.mark.parametrize('kind', ['nans', 'ties', 'offset'])
+def test_alpha1_matches_pandas(kind):
+    rng = np.random.default_rng(11)
+    if kind == 'ties':
+        close = 100.0 + rng.integers(-2, 3, (120, 3)).cumsum(axis=0)
+    elif kind == 'offset':
+        close = 1e9 + rng.standard_normal((120, 3)).cumsum(axis=0)
+    else:
+        close = 100.0 * np.exp(rng.standard_normal((120, 3)).cumsum(axis=0) / 100)
+        # A shorter history padded on top, as stack_right_aligned lays it out
+        close[:40, 1] = np.nan
+    expected = np.column_stack([_pandas_alpha1(pd.Series(close[:, j])).to_numpy() for j in range(close.shape[1])])
+    np.testing.assert_allclose(alpha_numba.alpha1(close), expected)
+    np.testing.assert_allclose(alpha_numba.alpha1_latest(close), alpha_numba.alpha1(close)[-1])
+
+
+def test_neutralize_array_matches_pandas(values):
+    weights = pd.DataFrame(values)
+    weights.iloc[5] = np.nan
+    weights.iloc[6, 1:] = np.nan
+    # The original pandas neutralization
+    demeaned = weights.sub(weights.mean(axis=1), axis=0)
+    expected = demeaned.div(demeaned.abs().sum(axis=1), axis=0)
+    np.testing.assert_allclose(neutralize_array(weights.to_numpy(copy=True)), expected.to_numpy(), atol=1e-12)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import alpha_numba
+from utils.expression_parser import ExpressionParser
+
+
+@pytest.fixture
+def context():
+    rng = np.random.default_rng(0)
+    return {
+        'close': pd.DataFrame(rng.random((60, 3)) + 1.0),
+        'volume': pd.DataFrame(rng.random((60, 3))),
+    }
+
+
+@pytest.mark.parametrize('formula', ['ts_argmax(close, 0)', 'sum(close, -5)', 'delay(close, -1)'])
+def test_compile_rejects_bad_window(formula):
+    with pytest.raises(ValueError, match='window'):
+        ExpressionParser().compile(formula)
+
+
+@pytest.mark.parametrize('formula', [
+    'ts_argmax(close, -3)', 'ts_argmin(close, 0)', 'ts_rank(close, -4)', 'product(close, -2)',
+])
+def test_window_kernels_reject_bad_window(context, formula):
+    with pytest.raises(ValueError, match='window'):
+        ExpressionParser().parse(formula).evaluate(context)
+
+
+@pytest.mark.parametrize('kernel', ['ts_argmax', 'rolling_argmax', 'rolling_rank', 'rolling_prod'])
+def test_kernels_return_nan_for_bad_window(kernel):
+    values = np.arange(12, dtype=np.float64)
+    if kernel != 'ts_argmax':
+        values = values.reshape(6, 2)
+    for window in (0, -3):
+        assert np.isnan(getattr(alpha_numba, kernel)(values, window)).all()
+
+
+@pytest.mark.parametrize('formula', [
+    'sum(close, -5)', 'mean(close, -3)', 'min(close, 0)', 'max(close, -1)', 'ts_min(close, 0)',
+    'ts_max(close, -2)', 'stddev(close, 0)', 'correlation(close, volume, -4)', 'covariance(close, volume, 0)',
+])
+def test_rolling_aggregations_reject_bad_window(context, formula):
+    with pytest.raises(ValueError, match='window'):
+        ExpressionParser().parse(formula).evaluate(context)
+
+
+def test_rolling_sum_and_mean_return_nan_for_bad_window():
+    values = np.arange(12, dtype=np.float64).reshape(6, 2)
+    for window in (0, -5):
+        assert np.isnan(alpha_numba.rolling_sum(values, window)).all()
+        assert np.isnan(alpha_numba.rolling_mean(values, window)).all()
+
+
+def test_indneutralize_with_panel_groups_matches_per_ticker():
+    rng = np.random.default_rng(1)
+    context = {field: pd.DataFrame(rng.random((30, 3)), columns=list('abc')) for field in ('close', 'open', 'high', 'low')}
+    formula = 'indneutralize(close - open, high > low)'
+    panel = ExpressionParser().parse(formula).evaluate(context)
+    for ticker in 'abc':
+        single = ExpressionParser().parse(formula).evaluate({field: frame[[ticker]] for field, frame in context.items()})
+        np.testing.assert_allclose(panel[ticker], single[ticker])
+
+
+@pytest.mark.parametrize('formula', [
+    'sum(close, 5) / mean(volume, 10)', 'stddev(close, 20) - stddev(volume, 2)', 'ts_min(close, 4) + ts_max(volume, 7)',
+    'ts_argmax(close, 5) - ts_argmin(volume, 3)', 'ts_rank(close, 6)', 'product(close, 3)', 'delta(close, 1) * delay(volume, 2)',
+    'correlation(close, volume, 10)', 'covariance(close, volume, 5)', 'signedpower(close - 1.5, 2)', 'scale(log(close))',
+    'abs(sign(close - 1.5))', 'close > 1.5 ? close : volume',
+])
+def test_compiled_matches_interpreted(formula):
+    rng = np.random.default_rng(3)
+    close = 1.0 + rng.random((80, 3))
+    close[rng.random((80, 3)) < 0.05] = np.nan
+    close[40:45, 2] = np.nan
+    context = {'close': pd.DataFrame(close), 'volume': pd.DataFrame(rng.integers(1, 5, (80, 3)).astype(np.float64))}
+    parser = ExpressionParser()
+    compiled = parser.compile(formula).evaluate(context)
+    interpreted = parser.parse(formula).evaluate(context)
+    np.testing.assert_allclose(np.asarray(compiled, dtype=np.float64), np.asarray(interpreted, dtype=np.float64), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from storage.price_cache import PriceCache
+
+
+def _candles(start, end, close=1.0):
+    index = pd.date_range(start, end, freq='1D', inclusive='left')
+    return pd.DataFrame({'close': np.full(len(index), close)}, index=index)
+
+
+def test_request_inside_covered_range_is_sliced():
+    cache = PriceCache()
+    cache.set('F', datetime(2024, 1, 1), datetime(2024, 2, 1), _candles('2024-01-01', '2024-02-01'))
+    data = cache.get('F', datetime(2024, 1, 10), datetime(2024, 1, 20))
+    assert list(data.index) == list(pd.date_range('2024-01-10', '2024-01-19'))
+
+
+def test_request_past_covered_range_misses():
+    cache = PriceCache()
+    cache.set('F', datetime(2024, 1, 1), datetime(2024, 2, 1), _candles('2024-01-01', '2024-02-01'))
+    assert cache.get('F', datetime(2024, 1, 10), datetime(2024, 2, 2)) is None
+    assert cache.get('F', datetime(2023, 12, 31), datetime(2024, 1, 10)) is None
+    assert cache.get('G', datetime(2024, 1, 10), datetime(2024, 1, 20)) is None
+
+
+def test_overlapping_ranges_merge_with_newest_candles_winning():
+    cache = PriceCache()
+    cache.set('F', datetime(2024, 1, 1), datetime(2024, 1, 20), _candles('2024-01-01', '2024-01-20', close=1.0))
+    cache.set('F', datetime(2024, 1, 10), datetime(2024, 2, 1), _candles('2024-01-10', '2024-02-01', close=2.0))
+    data = cache.get('F', datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert list(data.index) == list(pd.date_range('2024-01-01', '2024-01-31'))
+    assert (data.loc[:'2024-01-09', 'close'] == 1.0).all()
+    assert (data.loc['2024-01-10':, 'close'] == 2.0).all()
+
+
+def test_disjoint_range_replaces_entry():
+    cache = PriceCache()
+    cache.set('F', datetime(2024, 1, 1), datetime(2024, 1, 10), _candles('2024-01-01', '2024-01-10'))
+    cache.set('F', datetime(2024, 3, 1), datetime(2024, 3, 10), _candles('2024-03-01', '2024-03-10'))
+    assert cache.get('F', datetime(2024, 1, 1), datetime(2024, 1, 10)) is None
+    assert len(cache.get('F', datetime(2024, 3, 1), datetime(2024, 3, 10))) == 9
+
+
+def test_open_period_is_never_covered():
+    cache = PriceCache()
+    today = pd.Timestamp.now(tz='UTC').tz_localize(None).floor('1D')
+    start = today - timedelta(days=10)
+    # The fetch ran today and returned today's still-forming candle
+    cache.set('F', start, today + timedelta(days=1), _candles(start, today + timedelta(days=1)))
+    assert cache.get('F', start, today + timedelta(days=1)) is None
+    closed = cache.get('F', start, today)
+    assert closed.index.max() == today - timedelta(days=1)
+
+
+def test_future_end_and_aware_bounds():
+    cache = PriceCache()
+    today = pd.Timestamp.now(tz='UTC').tz_localize(None).floor('1D')
+    start = (today - timedelta(days=5)).to_pydatetime().replace(tzinfo=timezone.utc)
+    cache.set('F', start, datetime.now(timezone.utc) + timedelta(days=30), _candles(today - timedelta(days=5), today + timedelta(days=1)))
+    assert cache.get('F', start, datetime.now(timezone.utc) + timedelta(days=30)) is None
+    assert len(cache.get('F', start, today)) == 5
+
+
+def test_range_entirely_in_open_period_is_not_stored():
+    cache = PriceCache()
+    now = datetime.now(timezone.utc)
+    cache.set('F', now, now + timedelta(days=1), _candles(now.date(), now.date() + timedelta(days=1)))
+    assert cache.get('F', now, now + timedelta(hours=1)) is None
@@ -1,31 +1,39 @@
-import pandas as pd
+import warnings
+from typing import List
 import numpy as np
 
-def calculate_alpha1(stock_data: pd.DataFrame) -> pd.Series:
-    """Calculate alpha1 signal for a single stock"""
-    returns = stock_data['close'].pct_change()
+from utils.alpha_numba import alpha1_latest
 
-    returns_stddev = returns.rolling(window=20, closed='left').std()
-    
-    power_term = np.where(returns < 0, 
-                         returns_stddev, 
-                         stock_data['close'])
-    signed_power = np.sign(power_term) * (np.abs(power_term) ** 2)
-    
-    ts_argmax = pd.Series(signed_power).rolling(5, closed='left').apply(np.argmax)
-    
-    # Calculate alpha using current data
-    alpha = ts_argmax.rank(pct=True) - 0.5
-    
-    return alpha
+def stack_right_aligned(series: List[np.ndarray]) -> np.ndarray:
+    """
+    Stack 1-D histories of different lengths into a (time x ticker) float64 matrix
+    aligned on their last sample. The NaN padding above a shorter history is
+    treated like missing bars, so time-series operators give every column the
+    same values it would get on its own.
+    """
+    length = max((len(values) for values in series), default=0)
+    matrix = np.full((length, len(series)), np.nan)
+    for j, values in enumerate(series):
+        matrix[length - len(values):, j] = values
+    return matrix
 
-def neutralize_weights(weights: pd.Series) -> pd.Series:
-    """Neutralize weights to make sum = 0 and scale absolute values to sum to 1"""
-    # Demean to make sum = 0
-    weights = weights.sub(weights.mean(axis=1), axis=0)
-    
-    # Scale so absolute values sum to 1
-    abs_sum = weights.abs().sum(axis=1)
-    weights = weights.div(abs_sum, axis=0)
-    
-    return weights 
\ No newline at end of file
+def calculate_alpha1_latest(closes: List[np.ndarray]) -> np.ndarray:
+    """Latest alpha1 value for each of several close series, computed in one kernel call"""
+    close = stack_right_aligned(closes)
+    if len(close) == 0:
+        return np.full(len(closes), np.nan)
+    return alpha1_latest(close)
+
+def neutralize_array(w: np.ndarray) -> np.ndarray:
+    """Neutralize each row of a 2-D float64 array in place: sum 0, absolute values summing to 1"""
+    # Demean to make sum = 0 (rows without any signal stay NaN)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        w -= np.nanmean(w, axis=1, keepdims=True)
+
+    # Scale so absolute values sum to 1, in place on the same buffer
+    abs_sum = np.nansum(np.abs(w), axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w /= abs_sum
+
+    return w
@@ -0,0 +1,450 @@
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, nogil=True)
+def ts_argmax(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling argmax over a trailing window of `window` samples.
+
+    Matches `pd.Series(values).rolling(window).apply(np.argmax)`: the result is
+    the position of the (first) maximum inside each window and NaN until the
+    window is full or while it contains a NaN. Runs in O(n) by keeping a
+    monotonic decreasing deque of candidate indices.
+    """
+    n = values.shape[0]
+    out = np.full(n, np.nan)
+    if window < 1:
+        return out
+    deque = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    last_nan = -1
+
+    for i in range(n):
+        value = values[i]
+        if np.isnan(value):
+            last_nan = i
+        else:
+            # Strict comparison keeps the earliest index on ties, like np.argmax
+            while tail > head and values[deque[tail - 1]] < value:
+                tail -= 1
+            deque[tail] = i
+            tail += 1
+
+        start = i - window + 1
+        while tail > head and deque[head] < start:
+            head += 1
+
+        if start >= 0 and last_nan < start:
+            out[i] = deque[head] - start
+
+    return out
+
+
+# Kernels below operate column-wise on 2-D (time x ticker) float64 arrays and
+# mirror the pandas operators used by the expression evaluator: a rolling
+# result is NaN until the window is full or while it contains a NaN.
+
+@njit(cache=True, nogil=True)
+def _full_windows(values, window):
+    """Mask of positions whose trailing window is complete and NaN-free"""
+    rows, cols = values.shape
+    mask = np.zeros((rows, cols), dtype=np.bool_)
+    for j in range(cols):
+        last_nan = -1
+        for i in range(rows):
+            if np.isnan(values[i, j]):
+                last_nan = i
+            mask[i, j] = i >= window - 1 and last_nan <= i - window
+    return mask
+
+
+@njit(cache=True, nogil=True)
+def rolling_sum(values, window):
+    """Running sum: O(1) per step, Kahan-compensated against drift, restarted after a NaN"""
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    if window < 1:
+        return out
+    for j in range(cols):
+        total = 0.0
+        compensation = 0.0
+        run = 0
+        for i in range(rows):
+            value = values[i, j]
+            if np.isnan(value):
+                total = 0.0
+                compensation = 0.0
+                run = 0
+                continue
+            run += 1
+            step = value if run <= window else value - values[i - window, j]
+            y = step - compensation
+            t = total + y
+            compensation = (t - total) - y
+            total = t
+            if run >= window:
+                out[i, j] = total
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_mean(values, window):
+    return rolling_sum(values, window) / window
+
+
+@njit(cache=True, nogil=True)
+def rolling_std(values, window, ddof):
+    """
+    Welford's running mean and M2, swapping the leaving sample for the entering one.
+    Samples are taken relative to an anchor from the current window, so a large
+    common offset (prices around 1e9) does not eat the precision of the moments.
+    """
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    if window - ddof <= 0:
+        return out
+    for j in range(cols):
+        anchor = 0.0
+        mean = 0.0
+        m2 = 0.0
+        run = 0
+        for i in range(rows):
+            value = values[i, j]
+            if np.isnan(value):
+                mean = 0.0
+                m2 = 0.0
+                run = 0
+                continue
+            run += 1
+            if run == 1:
+                anchor = value
+            if run <= window:
+                diff = (value - anchor) - mean
+                mean += diff / run
+                m2 += diff * ((value - anchor) - mean)
+            elif run % window == 0:
+                # Re-anchor on the exact two-pass moments once per window length,
+                # so rounding from the updates below cannot accumulate (amortized O(1))
+                anchor = value
+                mean = 0.0
+                for k in range(i - window + 1, i + 1):
+                    mean += values[k, j] - anchor
+                mean /= window
+                m2 = 0.0
+                for k in range(i - window + 1, i + 1):
+                    diff = (values[k, j] - anchor) - mean
+                    m2 += diff * diff
+            else:
+                # Replace the leaving sample with the entering one at a fixed count
+                entering = value - anchor
+                leaving = values[i - window, j] - anchor
+                diff = entering - leaving
+                old_mean = mean
+                mean += diff / window
+                m2 += diff * (entering - mean + leaving - old_mean)
+            if run >= window:
+                out[i, j] = np.sqrt(max(m2, 0.0) / (window - ddof))
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _rolling_extreme(values, window, maximum):
+    """
+    Rolling max (or min) by van Herk/Gil-Werman: running extremes from the
+    start (prefix) and from the end (suffix) of every `window`-sized block, so
+    each window is the extreme of one suffix and one prefix - O(1) per step
+    whatever the window length, row by row across all tickers.
+    """
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    if window < 1:
+        return out
+    # Extremes are taken on values negated for min; NaN becomes -inf, and
+    # windows holding one are masked out below
+    sign = 1.0 if maximum else -1.0
+    prefix = np.empty((rows, cols))
+    suffix = np.empty((rows, cols))
+    for i in range(rows):
+        restart = i % window == 0
+        for j in range(cols):
+            value = sign * values[i, j]
+            if np.isnan(value):
+                value = -np.inf
+            if restart or value > prefix[i - 1, j]:
+                prefix[i, j] = value
+            else:
+                prefix[i, j] = prefix[i - 1, j]
+    for i in range(rows - 1, -1, -1):
+        restart = i == rows - 1 or (i + 1) % window == 0
+        for j in range(cols):
+            value = sign * values[i, j]
+            if np.isnan(value):
+                value = -np.inf
+            if restart or value > suffix[i + 1, j]:
+                suffix[i, j] = value
+            else:
+                suffix[i, j] = suffix[i + 1, j]
+    full = _full_windows(values, window)
+    for i in range(window - 1, rows):
+        for j in range(cols):
+            if full[i, j]:
+                out[i, j] = sign * max(suffix[i - window + 1, j], prefix[i, j])
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_min(values, window):
+    return _rolling_extreme(values, window, False)
+
+
+@njit(cache=True, nogil=True)
+def rolling_max(values, window):
+    return _rolling_extreme(values, window, True)
+
+
+@njit(cache=True, nogil=True)
+def rolling_argmax(values, window):
+    rows, cols = values.shape
+    out = np.empty((rows, cols))
+    for j in range(cols):
+        out[:, j] = ts_argmax(np.ascontiguousarray(values[:, j]), window)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_argmin(values, window):
+    return rolling_argmax(-values, window)
+
+
+@njit(cache=True, nogil=True)
+def rolling_prod(values, window):
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    if window < 1:
+        return out
+    full = _full_windows(values, window)
+    for j in range(cols):
+        for i in range(window - 1, rows):
+            if full[i, j]:
+                total = 1.0
+                for k in range(i - window + 1, i + 1):
+                    total *= values[k, j]
+                out[i, j] = total
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_rank(values, window):
+    """Percentile rank of the newest sample within its window, minus 0.5"""
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    if window < 1:
+        return out
+    full = _full_windows(values, window)
+    for j in range(cols):
+        for i in range(window - 1, rows):
+            if full[i, j]:
+                current = values[i, j]
+                less = 0
+                equal = 0
+                for k in range(i - window + 1, i + 1):
+                    if values[k, j] < current:
+                        less += 1
+                    elif values[k, j] == current:
+                        equal += 1
+                out[i, j] = (less + (equal + 1) / 2.0) / window - 0.5
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rolling_cov(x, y, window, correlation):
+    rows, cols = x.shape
+    out = np.full((rows, cols), np.nan)
+    if window < 2:
+        return out
+    full_x = _full_windows(x, window)
+    full_y = _full_windows(y, window)
+    for j in range(cols):
+        for i in range(window - 1, rows):
+            if full_x[i, j] and full_y[i, j]:
+                mean_x = 0.0
+                mean_y = 0.0
+                for k in range(i - window + 1, i + 1):
+                    mean_x += x[k, j]
+                    mean_y += y[k, j]
+                mean_x /= window
+                mean_y /= window
+                sxy = 0.0
+                sxx = 0.0
+                syy = 0.0
+                for k in range(i - window + 1, i + 1):
+                    dx = x[k, j] - mean_x
+                    dy = y[k, j] - mean_y
+                    sxy += dx * dy
+                    sxx += dx * dx
+                    syy += dy * dy
+                if not correlation:
+                    out[i, j] = sxy / (window - 1)
+                elif sxx > 0.0 and syy > 0.0:
+                    out[i, j] = sxy / np.sqrt(sxx * syy)
+    return out
+
+
+@njit(cache=True, nogil=True)
+def shift(values, periods):
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    for i in range(rows):
+        source = i - periods
+        if 0 <= source < rows:
+            out[i, :] = values[source, :]
+    return out
+
+
+@njit(cache=True, nogil=True)
+def delta(values, periods):
+    return values - shift(values, periods)
+
+
+@njit(cache=True, nogil=True)
+def signed_power(values, exponent):
+    return np.sign(values) * np.abs(values) ** exponent
+
+
+@njit(cache=True, nogil=True)
+def rank_pct(values):
+    """Percentile rank over time of every sample in each column, minus 0.5"""
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    for j in range(cols):
+        column = values[:, j]
+        valid = np.where(~np.isnan(column))[0]
+        count = valid.shape[0]
+        if count == 0:
+            continue
+        ordered = valid[np.argsort(column[valid], kind='mergesort')]
+        start = 0
+        while start < count:
+            stop = start + 1
+            while stop < count and column[ordered[stop]] == column[ordered[start]]:
+                stop += 1
+            # Ties share the average of their 1-based ranks
+            average = (start + stop + 1) / 2.0
+            for k in range(start, stop):
+                out[ordered[k], j] = average / count - 0.5
+            start = stop
+    return out
+
+
+@njit(cache=True, nogil=True)
+def rank_pct_last(values):
+    """rank_pct of the last row only: a counting pass per column instead of a sort"""
+    rows, cols = values.shape
+    out = np.full(cols, np.nan)
+    if rows == 0:
+        return out
+    for j in range(cols):
+        last = values[rows - 1, j]
+        if np.isnan(last):
+            continue
+        below = 0
+        equal = 0
+        count = 0
+        for i in range(rows):
+            value = values[i, j]
+            if not np.isnan(value):
+                count += 1
+                if value < last:
+                    below += 1
+                elif value == last:
+                    equal += 1
+        out[j] = (below + (equal + 1) / 2.0) / count - 0.5
+    return out
+
+
+@njit(cache=True, nogil=True)
+def _column_mean(values):
+    rows, cols = values.shape
+    means = np.full(cols, np.nan)
+    for j in range(cols):
+        total = 0.0
+        count = 0
+        for i in range(rows):
+            if not np.isnan(values[i, j]):
+                total += values[i, j]
+                count += 1
+        if count > 0:
+            means[j] = total / count
+    return means
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def scale(values):
+    """Z-score every column over time (sample standard deviation)"""
+    rows, cols = values.shape
+    out = np.full((rows, cols), np.nan)
+    means = _column_mean(values)
+    for j in range(cols):
+        m2 = 0.0
+        count = 0
+        for i in range(rows):
+            if not np.isnan(values[i, j]):
+                diff = values[i, j] - means[j]
+                m2 += diff * diff
+                count += 1
+        if count > 1:
+            std = np.sqrt(m2 / (count - 1))
+            for i in range(rows):
+                out[i, j] = (values[i, j] - means[j]) / std
+    return out
+
+
+@njit(cache=True, nogil=True)
+def demean(values):
+    return values - _column_mean(values)
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def alpha1(close):
+    """
+    Alpha#1 for every column of a (time x ticker) close matrix:
+    rank(Ts_ArgMax(SignedPower(returns < 0 ? stddev(returns, 20) : close, 2), 5)) - 0.5,
+    with the stddev and argmax windows ending at the previous bar.
+    """
+    return rank_pct(_alpha1_argmax(close))
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def alpha1_latest(close):
+    """Last row of alpha1; the rank still spans the whole history, but needs no sort"""
+    return rank_pct_last(_alpha1_argmax(close))
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _alpha1_argmax(close):
+    """Ts_ArgMax(SignedPower(...), 5) part of alpha1, before the rank over time"""
+    rows, cols = close.shape
+    returns = np.full((rows, cols), np.nan)
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    stddev = shift(rolling_std(returns, 20, 1), 1)
+    power = np.where(returns < 0.0, stddev, close)
+    return shift(rolling_argmax(power * np.abs(power), 5), 1)
+
+
+def warmup():
+    """
+    Compile (or load from the on-disk cache) every kernel for the argument
+    types the services pass, so the first backtest or forward-test iteration
+    does not pay Numba's JIT latency.
+    """
+    values = np.ones((2, 1))
+    for kernel in (rolling_sum, rolling_mean, rolling_min, rolling_max, rolling_argmax,
+                   rolling_argmin, rolling_prod, rolling_rank, shift, delta):
+        kernel(values, 1)
+    rolling_std(values, 1, 0)
+    rolling_std(values, 1, 1)
+    rolling_cov(values, values, 1, True)
+    for kernel in (rank_pct, scale, demean, alpha1, alpha1_latest):
+        kernel(values)
@@ -4,6 +4,7 @@ from fastapi.security import SecurityScopes
 from client.tinkoff_client import get_tinkoff_client, TinkoffClient
 from auth.router import get_current_user_with_db
 from auth.db import UserDB, get_user_db
+from client.client_cache import get_client_from_cache
 
 def create_auth_client_dependency(scopes: List[str]) -> Callable:
     """
@@ -34,6 +35,12 @@ def create_auth_client_dependency(scopes: List[str]) -> Callable:
         Raises:
             HTTPException: If user is not authenticated or token is not set
         """
+        # A cached client already carries the user's token, so the common case
+        # needs neither the database read nor the token decryption
+        cached_client = get_client_from_cache(current_user["id"])
+        if cached_client:
+            return cached_client
+
         # Get token securely from database
         user_token = await user_db.get_tinkoff_token(current_user["id"])
         
@@ -4,7 +4,6 @@ from typing import Callable, Any, Optional
 from datetime import datetime, timedelta
 import json
 import logging
-import traceback
 
 # Configure logging
 logging.basicConfig(
@@ -20,12 +19,13 @@ def handle_errors(func: Callable) -> Callable:
             return await func(*args, **kwargs)
         except HTTPException as e:
             # Pass through HTTP exceptions (like 400 Bad Request) without changing them
-            logger.error(f"HTTP exception in {func.__name__}: {e.status_code}: {e.detail}")
+            logger.error("HTTP exception in %s: %s: %s", func.__name__, e.status_code, e.detail)
             raise
         except ValueError as e:
-            logger.error(f"Validation error in {func.__name__}: {str(e)}\n{traceback.format_exc()}")
+            # exc_info defers formatting the traceback until the record is emitted
+            logger.error("Validation error in %s: %s", func.__name__, e, exc_info=True)
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
-            logger.error(f"Unexpected error in {func.__name__}: {str(e)}\n{traceback.format_exc()}")
+            logger.error("Unexpected error in %s: %s", func.__name__, e, exc_info=True)
             raise HTTPException(status_code=500, detail="Internal server error")
     return wrapper
@@ -1,18 +1,57 @@
 # expression_parser.py
 import ast
+import copy
+from functools import lru_cache
 import operator as op
 import numpy as np
 import pandas as pd
+from numba import njit
+from numba.core.errors import NumbaError
+
+from utils import alpha_numba
+
+
+def _as_pandas(x):
+    """Wrap raw values into a Series, keeping Series and (time x ticker) DataFrames as is"""
+    if isinstance(x, (pd.Series, pd.DataFrame)):
+        return x
+    return pd.Series(x)
+
+def _as_matrix(x) -> np.ndarray:
+    """Contiguous float64 (time x ticker) view of a Series or DataFrame, as the kernels expect"""
+    return np.ascontiguousarray(x.to_numpy(dtype=np.float64).reshape(len(x), -1))
+
+def _demean_groups(x, group):
+    """Subtract each group's mean; one hashed group-by, rows without a group keep their value"""
+    return x - x.groupby(group).transform('mean').fillna(0)
+
+def _apply_kernel(x, kernel, *args):
+    """Run a 2-D (time x ticker) alpha_numba kernel on a Series, DataFrame or array, keeping its labels"""
+    x = _as_pandas(x)
+    result = kernel(_as_matrix(x), *args)
+    if isinstance(x, pd.DataFrame):
+        return pd.DataFrame(result, index=x.index, columns=x.columns)
+    return pd.Series(result[:, 0], index=x.index, name=x.name)
 
 class Expression:
     def evaluate(self, context: dict):
         raise NotImplementedError
+    def to_source(self, variables: set) -> str:
+        """Numba source computing this node over 2-D (time x ticker) arrays"""
+        raise NotImplementedError(f"{type(self).__name__} cannot be compiled")
+    def map_children(self, fn):
+        """Copy of this node with `fn` applied to each direct sub-expression"""
+        return self
 
 class Const(Expression):
     def __init__(self, value):
         self.value = value
     def evaluate(self, context):
         return self.value
+    def to_source(self, variables):
+        if isinstance(self.value, bool) or not isinstance(self.value, (int, float)):
+            raise NotImplementedError(f"Constant {self.value!r} cannot be compiled")
+        return repr(float(self.value))
 
 class Var(Expression):
     def __init__(self, name):
@@ -22,112 +61,203 @@ class Var(Expression):
             return context[self.name]
         else:
             raise ValueError(f"Unknown variable: {self.name}")
+    def to_source(self, variables):
+        variables.add(self.name)
+        return f"v_{self.name}"
 
 class Func(Expression):
+    # Kernels from utils.alpha_numba backing `name(x, n)` functions when compiled
+    window_kernels = {
+        'delay': 'shift',
+        'delta': 'delta',
+        'ts_rank': 'rolling_rank',
+        'ts_min': 'rolling_min',
+        'ts_max': 'rolling_max',
+        'ts_argmax': 'rolling_argmax',
+        'ts_argmin': 'rolling_argmin',
+        'sum': 'rolling_sum',
+        'product': 'rolling_prod',
+        'mean': 'rolling_mean',
+        'min': 'rolling_min',
+        'max': 'rolling_max',
+    }
+
     def __init__(self, name, args):
         self.name = name
         self.args = args
-    def evaluate(self, context):
-        eval_args = [arg.evaluate(context) for arg in self.args]
-        x = eval_args[0] if eval_args else None
-
-        # Базовые функции
-        if self.name == 'abs':
-            return np.abs(x)
-        elif self.name == 'sign':
-            return np.sign(x)
-        elif self.name == 'log':
-            return np.log(x)
-        elif self.name == 'rank':
-            return pd.Series(x).rank(pct=True) - 0.5
-        elif self.name == 'delay':
-            k = int(eval_args[1])
-            return pd.Series(x).shift(k)
-        elif self.name == 'delta':
-            k = int(eval_args[1])
-            return pd.Series(x).diff(k)
-
-        elif self.name == 'ts_rank':
-            n = int(eval_args[1])
-            s = pd.Series(x)
-            return s.rolling(n).apply(lambda w: (w.rank(pct=True).iloc[-1]) - 0.5, raw=False)
-
-        elif self.name == 'ts_min':
-            n = int(eval_args[1])
-            return pd.Series(x).rolling(n).min()
-
-        elif self.name == 'ts_max':
-            n = int(eval_args[1])
-            return pd.Series(x).rolling(n).max()
+        # Unknown names still parse; they raise when evaluated
+        self._impl = self._DISPATCH.get(name, Func._unknown)
+
+    def map_children(self, fn):
+        clone = copy.copy(self)
+        clone.args = [fn(arg) for arg in self.args]
+        return clone
+
+    def _checked_window(self, window):
+        # Windows come from user formulas and the nopython kernels index with
+        # them unchecked, so reject bad ones before any kernel runs
+        minimum = 0 if self.name in ('delay', 'delta') else 1
+        window = int(window)
+        if window < minimum:
+            raise ValueError(f"{self.name} window must be an integer {minimum} or greater, got {window}")
+        return window
+
+    def _window(self, i):
+        # Constant subtrees such as `-5` count as constants too, so they get checked
+        arg = self.args[i]
+        variables = set()
+        arg.to_source(variables)
+        if variables:
+            raise NotImplementedError(f"{self.name} needs a constant window to be compiled")
+        return self._checked_window(arg.evaluate({}))
 
+    def to_source(self, variables):
+        args = [arg.to_source(variables) for arg in self.args]
+        if self.name in ('abs', 'sign', 'log'):
+            return f"np.{self.name}({args[0]})"
+        elif self.name == 'rank':
+            return f"kernels.rank_pct({args[0]})"
         elif self.name == 'scale':
-            series_x = pd.Series(x)
-            return (series_x - series_x.mean()) / series_x.std()
+            return f"kernels.scale({args[0]})"
         elif self.name == 'signedpower':
-            exp = eval_args[1]
-            return np.sign(x) * (np.abs(x) ** exp)
+            return f"kernels.signed_power({args[0]}, {args[1]})"
         elif self.name == 'ternary':
-            cond = eval_args[0]
-            true_val = eval_args[1]
-            false_val = eval_args[2]
-            cond_series = pd.Series(cond).astype(bool)
-            idx = cond_series.index if hasattr(cond_series, 'index') else None
-            x_series = pd.Series(true_val, index=idx)
-            y_series = pd.Series(false_val, index=idx)
-            return x_series.where(cond_series, y_series)
-        elif self.name == 'correlation':
-            y = eval_args[1]; n = int(eval_args[2])
-            series_x = pd.Series(x); series_y = pd.Series(y)
-            return series_x.rolling(n).corr(series_y)
-        elif self.name == 'covariance':
-            y = eval_args[1]; n = int(eval_args[2])
-            series_x = pd.Series(x); series_y = pd.Series(y)
-            return series_x.rolling(n).cov(series_y)
-        elif self.name == 'ts_argmax':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).apply(lambda s: np.nanargmax(s.values) if not np.isnan(s.values).all() else np.nan, raw=False)
-        elif self.name == 'ts_argmin':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).apply(lambda s: np.nanargmin(s.values) if not np.isnan(s.values).all() else np.nan, raw=False)
-        elif self.name == 'sum':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).sum()
-        elif self.name == 'product':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).apply(lambda s: np.prod(s.values) if not np.isnan(s.values).all() else np.nan, raw=False)
+            return f"np.where({args[0]}, {args[1]}, {args[2]})"
+        elif self.name in self.window_kernels:
+            return f"kernels.{self.window_kernels[self.name]}({args[0]}, {self._window(1)})"
         elif self.name == 'stddev':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).std(ddof=0)
-        elif self.name == 'mean':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).mean()
-        elif self.name == 'min':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).min()
-        elif self.name == 'max':
-            n = int(eval_args[1])
-            series_x = pd.Series(x)
-            return series_x.rolling(n).max()
-        elif self.name == 'indneutralize':
-            series_x = pd.Series(x)
-            if len(eval_args) > 1:
-                group = pd.Series(eval_args[1])
+            return f"kernels.rolling_std({args[0]}, {self._window(1)}, 0)"
+        elif self.name in ('correlation', 'covariance'):
+            return f"kernels.rolling_cov({args[0]}, {args[1]}, {self._window(2)}, {self.name == 'correlation'})"
+        elif self.name == 'indneutralize' and len(args) == 1:
+            return f"kernels.demean({args[0]})"
+        raise NotImplementedError(f"Function {self.name} cannot be compiled")
+
+    def evaluate(self, context):
+        return self._impl(self, [arg.evaluate(context) for arg in self.args])
+
+    # Базовые функции
+    def _abs(self, args):
+        return np.abs(args[0])
+
+    def _sign(self, args):
+        return np.sign(args[0])
+
+    def _log(self, args):
+        return np.log(args[0])
+
+    def _rank(self, args):
+        return _as_pandas(args[0]).rank(pct=True) - 0.5
+
+    def _delay(self, args):
+        return _as_pandas(args[0]).shift(self._checked_window(args[1]))
+
+    def _delta(self, args):
+        return _as_pandas(args[0]).diff(self._checked_window(args[1]))
+
+    def _ts_rank(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_rank, self._checked_window(args[1]))
+
+    def _ts_min(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_min, self._checked_window(args[1]))
+
+    def _ts_max(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_max, self._checked_window(args[1]))
+
+    def _scale(self, args):
+        # Same sample z-score as the compiled path, without the pandas reductions
+        return _apply_kernel(args[0], alpha_numba.scale)
+
+    def _signedpower(self, args):
+        x, exp = args[0], args[1]
+        return np.sign(x) * (np.abs(x) ** exp)
+
+    def _ternary(self, args):
+        cond, true_val, false_val = args[0], args[1], args[2]
+        if isinstance(cond, pd.DataFrame):
+            cond_frame = cond.astype(bool)
+            if not isinstance(true_val, pd.DataFrame):
+                true_val = pd.DataFrame(true_val, index=cond_frame.index, columns=cond_frame.columns)
+            return true_val.where(cond_frame, false_val)
+        if not any(isinstance(v, (pd.Series, pd.DataFrame)) for v in args):
+            # Nothing to align: select element-wise without building Series
+            return np.where(np.asarray(cond, dtype=bool), true_val, false_val)
+        cond_series = pd.Series(cond).astype(bool)
+        idx = cond_series.index if hasattr(cond_series, 'index') else None
+        x_series = pd.Series(true_val, index=idx)
+        y_series = pd.Series(false_val, index=idx)
+        return x_series.where(cond_series, y_series)
+
+    def _cov(self, args):
+        n = self._checked_window(args[2])
+        series_x = _as_pandas(args[0]); series_y = _as_pandas(args[1])
+        correlation = self.name == 'correlation'
+        if type(series_x) is type(series_y) and all(a.equals(b) for a, b in zip(series_x.axes, series_y.axes)):
+            # Same labels: no alignment needed, one compiled pass over both
+            return _apply_kernel(series_x, alpha_numba.rolling_cov, _as_matrix(series_y), n, correlation)
+        rolling = series_x.rolling(n)
+        return rolling.corr(series_y) if correlation else rolling.cov(series_y)
+
+    def _ts_argmax(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_argmax, self._checked_window(args[1]))
+
+    def _ts_argmin(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_argmin, self._checked_window(args[1]))
+
+    def _sum(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_sum, self._checked_window(args[1]))
+
+    def _product(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_prod, self._checked_window(args[1]))
+
+    def _stddev(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_std, self._checked_window(args[1]), 0)
+
+    def _mean(self, args):
+        return _apply_kernel(args[0], alpha_numba.rolling_mean, self._checked_window(args[1]))
+
+    def _indneutralize(self, args):
+        series_x = _as_pandas(args[0])
+        if len(args) > 1:
+            group = np.asarray(args[1])
+            if group.ndim == 2 and isinstance(series_x, pd.DataFrame):
+                # (time x ticker) groups: every ticker is neutralized within its own column
                 result = series_x.copy()
-                for grp in group.unique():
-                    mask = (group == grp)
-                    result.loc[mask] = result.loc[mask] - series_x.loc[mask].mean()
+                for j in range(series_x.shape[1]):
+                    result.iloc[:, j] = _demean_groups(series_x.iloc[:, j], group[:, j])
                 return result
-            else:
-                return series_x - series_x.mean()
-        else:
-            raise ValueError(f"Unknown function: {self.name}")
+            return _demean_groups(series_x, group)
+        return series_x - series_x.mean()
+
+    def _unknown(self, args):
+        raise ValueError(f"Unknown function: {self.name}")
+
+# Handlers resolved once per node in Func.__init__ instead of a string compare chain per call
+Func._DISPATCH = {
+    'abs': Func._abs,
+    'sign': Func._sign,
+    'log': Func._log,
+    'rank': Func._rank,
+    'delay': Func._delay,
+    'delta': Func._delta,
+    'ts_rank': Func._ts_rank,
+    'ts_min': Func._ts_min,
+    'ts_max': Func._ts_max,
+    'scale': Func._scale,
+    'signedpower': Func._signedpower,
+    'ternary': Func._ternary,
+    'correlation': Func._cov,
+    'covariance': Func._cov,
+    'ts_argmax': Func._ts_argmax,
+    'ts_argmin': Func._ts_argmin,
+    'sum': Func._sum,
+    'product': Func._product,
+    'stddev': Func._stddev,
+    'mean': Func._mean,
+    'min': Func._ts_min,
+    'max': Func._ts_max,
+    'indneutralize': Func._indneutralize,
+}
 
 class BinOp(Expression):
     ops = {
@@ -137,12 +267,26 @@ class BinOp(Expression):
         ast.Div: op.truediv,
         ast.Pow: op.pow
     }
+    symbols = {
+        ast.Add: '+',
+        ast.Sub: '-',
+        ast.Mult: '*',
+        ast.Div: '/',
+        ast.Pow: '**'
+    }
     def __init__(self, left, right, op_node):
         self.left = left
         self.right = right
         self.op = self.ops[type(op_node)]
+        self.symbol = self.symbols[type(op_node)]
     def evaluate(self, context):
         return self.op(self.left.evaluate(context), self.right.evaluate(context))
+    def to_source(self, variables):
+        return f"({self.left.to_source(variables)} {self.symbol} {self.right.to_source(variables)})"
+    def map_children(self, fn):
+        clone = copy.copy(self)
+        clone.left, clone.right = fn(self.left), fn(self.right)
+        return clone
 
 class UnaryOp(Expression):
     def __init__(self, operand, op_node):
@@ -156,6 +300,16 @@ class UnaryOp(Expression):
             return -val
         else:
             raise ValueError("Unsupported unary operator")
+    def to_source(self, variables):
+        if isinstance(self.op, ast.UAdd):
+            return f"(+{self.operand.to_source(variables)})"
+        elif isinstance(self.op, ast.USub):
+            return f"(-{self.operand.to_source(variables)})"
+        raise NotImplementedError("Unsupported unary operator")
+    def map_children(self, fn):
+        clone = copy.copy(self)
+        clone.operand = fn(self.operand)
+        return clone
 
 class Compare(Expression):
     ops = {
@@ -166,12 +320,55 @@ class Compare(Expression):
         ast.Eq: op.eq,
         ast.NotEq: op.ne
     }
+    symbols = {
+        ast.Gt: '>',
+        ast.Lt: '<',
+        ast.GtE: '>=',
+        ast.LtE: '<=',
+        ast.Eq: '==',
+        ast.NotEq: '!='
+    }
     def __init__(self, left, right, op_node):
         self.left = left
         self.right = right
         self.op = self.ops[type(op_node)]
+        self.symbol = self.symbols[type(op_node)]
     def evaluate(self, context):
         return self.op(self.left.evaluate(context), self.right.evaluate(context))
+    def to_source(self, variables):
+        return f"({self.left.to_source(variables)} {self.symbol} {self.right.to_source(variables)})"
+    def map_children(self, fn):
+        clone = copy.copy(self)
+        clone.left, clone.right = fn(self.left), fn(self.right)
+        return clone
+
+class CompiledExpression(Expression):
+    """Expression compiled into one Numba kernel over 2-D (time x ticker) arrays"""
+    def __init__(self, expression, kernel, variables):
+        self.expression = expression
+        self.kernel = kernel
+        self.variables = variables
+    def evaluate(self, context):
+        if self.kernel is not None and all(name in context for name in self.variables):
+            try:
+                return self._evaluate_kernel(context)
+            except NumbaError:
+                # Inputs the kernel cannot be typed for; interpret from now on
+                self.kernel = None
+        return self.expression.evaluate(context)
+    def _evaluate_kernel(self, context):
+        values = [context[name] for name in self.variables]
+        arrays = [
+            np.ascontiguousarray(np.asarray(value, dtype=np.float64).reshape(len(value), -1))
+            for value in values
+        ]
+        result = self.kernel(*arrays)
+        template = values[0]
+        if isinstance(template, pd.DataFrame):
+            return pd.DataFrame(result, index=template.index, columns=template.columns)
+        if isinstance(template, pd.Series):
+            return pd.Series(result[:, 0], index=template.index)
+        return result.reshape(np.shape(template))
 
 class ExpressionParser:
     def _preprocess(self, text: str) -> str:
@@ -211,9 +408,51 @@ class ExpressionParser:
         return text
 
     def parse(self, text: str) -> Expression:
-        prepared = self._preprocess(text)
+        return self._parse_cached(text)
+
+    def compile(self, text: str) -> Expression:
+        """Parse `text` and compile it to a Numba kernel when every node supports it"""
+        return self._compile_cached(text)
+
+    @classmethod
+    @lru_cache(maxsize=512)
+    def _compile_cached(cls, text: str) -> Expression:
+        return cls._compile_tree(cls._parse_cached(text))
+
+    @classmethod
+    def _compile_tree(cls, expression: Expression) -> Expression:
+        if isinstance(expression, (Const, Var)):
+            return expression
+        variables = set()
+        try:
+            source = expression.to_source(variables)
+        except NotImplementedError:
+            # Compile the largest supported subtrees and interpret only the rest
+            return expression.map_children(cls._compile_tree)
+        if not variables:
+            return expression
+
+        names = sorted(variables)
+        code = f"def kernel({', '.join(f'v_{name}' for name in names)}):\n    return {source}\n"
+        return CompiledExpression(expression, cls._build_kernel(code), names)
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _build_kernel(code: str):
+        # Keyed by generated source, so formulas that differ only in spacing or
+        # redundant parentheses share one dispatcher and its JIT-compiled code
+        namespace = {'np': np, 'kernels': alpha_numba}
+        exec(code, namespace)
+        return njit(nogil=True, error_model='numpy')(namespace['kernel'])
+
+    @classmethod
+    @lru_cache(maxsize=512)
+    def _parse_cached(cls, text: str) -> Expression:
+        # Parsed trees are immutable, so they can be shared across callers
+        parser = cls()
+        prepared = parser._preprocess(text)
         node = ast.parse(prepared, mode='eval').body
-        return self._parse_node(node)
+        return parser._parse_node(node)
 
     def _parse_node(self, node):
         if isinstance(node, ast.Constant):
@@ -0,0 +1,46 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import plotly.io as pio
+
+# Kaleido renders one image at a time per process, so PNG export is farmed
+# out to a pool of worker processes that stays warm between requests
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Every spawned worker loads plotly and its own Kaleido/Chromium, so the pool
+# is kept small rather than sized to the machine
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+
+def _render_png(figure: Dict[str, Any]) -> bytes:
+    """Render a plotly figure dict to PNG bytes inside a worker process"""
+    return pio.to_image(figure, format='png')
+
+def get_render_executor() -> ProcessPoolExecutor:
+    """Get the shared render pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, min(RENDER_WORKERS, os.cpu_count() or 1)),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+def shutdown_render_executor():
+    """Stop the render pool; called on application shutdown"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+async def render_pngs(figures: Dict[str, Any]) -> Dict[str, bytes]:
+    """Render plotly figures to PNG bytes concurrently, keyed like the input"""
+    loop = asyncio.get_running_loop()
+    executor = get_render_executor()
+    images = await asyncio.gather(*(
+        loop.run_in_executor(executor, _render_png, figure.to_dict())
+        for figure in figures.values()
+    ))
+    return dict(zip(figures, images))